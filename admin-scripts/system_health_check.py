@@ -6,15 +6,27 @@ Author: Gabriel Monteiro
 """
 
 import psutil
+from array import array
 import platform
-import subprocess
 import json
+import os
 import smtplib
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import argparse
+import asyncio
+import atexit
+import functools
 import logging
+import textwrap
+import time
+
+try:
+    from icmplib import async_ping
+    from icmplib.exceptions import ICMPLibError
+except ImportError:
+    async_ping = None
 
 # Configuração de logging
 logging.basicConfig(
@@ -26,16 +38,151 @@ logging.basicConfig(
     ]
 )
 
+# Identificação do host, invariável durante a execução
+_HOSTNAME = platform.node()
+_OS = f"{platform.system()} {platform.release()}"
+_ARCH = platform.architecture()[0]
+
+# Última amostra de CPU, persistida entre execuções para cálculo sem bloqueio
+STATE_FILE = '/var/run/system_health_state.json'
+# Janela válida entre amostras: abaixo do mínimo o delta é só ruído,
+# acima do máximo deixa de representar o uso atual
+CPU_MIN_SAMPLE_SECONDS = 1
+CPU_MAX_SAMPLE_SECONDS = 900  # bem acima do intervalo do cron (*/5)
+
+def _ttl_cache(ttl):
+    """Memoiza uma função sem argumentos por `ttl` segundos"""
+    def decorator(func):
+        @functools.lru_cache(maxsize=1)
+        def cached(_bucket):
+            return func()
+        
+        @functools.wraps(func)
+        def wrapper():
+            return cached(int(time.monotonic() // ttl))
+        
+        return wrapper
+    return decorator
+
+# Sistemas de arquivos virtuais, sem uso de disco relevante
+PSEUDO_FILESYSTEMS = frozenset({
+    'tmpfs', 'devtmpfs', 'squashfs', 'overlay', 'proc', 'sysfs',
+    'cgroup', 'cgroup2', ''
+})
+
+@_ttl_cache(60)
+def _disk_partitions():
+    """Partições montadas (topologia raramente muda entre execuções)"""
+    return [
+        partition for partition in psutil.disk_partitions(all=False)
+        if partition.fstype not in PSEUDO_FILESYSTEMS
+    ]
+
+# Campos de /proc/stat (linha "cpu"), em jiffies
+CPU_STAT_FIELDS = ('user', 'nice', 'system', 'idle', 'iowait', 'irq',
+                   'softirq', 'steal', 'guest', 'guest_nice')
+
+def _read_meminfo():
+    """Lê /proc/meminfo e retorna os campos em bytes"""
+    with open('/proc/meminfo') as f:
+        fields = (line.split() for line in f)
+        return {parts[0].rstrip(':'): int(parts[1]) * 1024 for parts in fields}
+
+def _read_loadavg():
+    """Lê load average de 1, 5 e 15 minutos de /proc/loadavg"""
+    with open('/proc/loadavg') as f:
+        return tuple(float(value) for value in f.read().split()[:3])
+
+def _read_stat():
+    """Lê de /proc/stat os contadores agregados de CPU e o horário de boot"""
+    with open('/proc/stat') as f:
+        values = f.readline().split()[1:]
+        btime = None
+        for line in f:
+            if line.startswith('btime '):
+                btime = int(line.split()[1])
+                break
+    return dict(zip(CPU_STAT_FIELDS, (int(value) for value in values))), btime
+
+class CheckMessages:
+    """Mensagens geradas por uma verificação"""
+    
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.alerts = []
+        self.warnings = []
+        self.info = []
+    
+    def alert(self, message):
+        self.alerts.append(message)
+    
+    def warning(self, message):
+        self.warnings.append(message)
+    
+    def add_info(self, template, *args):
+        # Mensagens informativas só são formatadas no modo verbose
+        if self.verbose:
+            self.info.append(template.format(*args))
+
 class SystemHealthChecker:
-    def __init__(self):
+    def __init__(self, verbose=False):
+        self.verbose = verbose
         self.alerts = []
         self.warnings = []
         self.info = []
+        # Sessão SMTP reaproveitada entre envios (aberta sob demanda)
+        self._smtp = None
+        # Número de cores não muda durante a execução
+        self._cpu_count = psutil.cpu_count()
+        
+    def _sample_cpu_percent(self):
+        """Calcula uso de CPU pela diferença em relação à amostra anterior"""
+        current, btime = _read_stat()
+        now = time.time()
+        
+        previous = None
+        try:
+            with open(STATE_FILE) as f:
+                state = json.load(f)
+            timestamp = state.get('timestamp')
+            # Amostra de outro boot ou fora da janela válida é descartada
+            if (isinstance(timestamp, (int, float))
+                    and state.get('btime') == btime
+                    and CPU_MIN_SAMPLE_SECONDS <= now - timestamp <= CPU_MAX_SAMPLE_SECONDS):
+                previous = state.get('cpu_jiffies')
+            if not isinstance(previous, dict):
+                previous = None
+        except (OSError, ValueError, AttributeError):
+            pass
+        
+        try:
+            with open(STATE_FILE, 'w') as f:
+                json.dump({'timestamp': now, 'btime': btime, 'cpu_jiffies': current}, f)
+        except OSError as e:
+            logging.debug(f"Não foi possível salvar estado em {STATE_FILE}: {e}")
         
+        if previous:
+            # guest/guest_nice já estão contabilizados em user/nice
+            total_fields = [k for k in current if k not in ('guest', 'guest_nice')]
+            idle_fields = ('idle', 'iowait')
+            try:
+                total_delta = sum(current[k] - previous.get(k, 0) for k in total_fields)
+                idle_delta = sum(current.get(k, 0) - previous.get(k, 0) for k in idle_fields)
+            except TypeError:
+                # Valores não numéricos no arquivo de estado
+                total_delta = 0
+            if total_delta > 0:
+                return round(100 * (total_delta - idle_delta) / total_delta, 1)
+        
+        # Primeira execução, amostra fora da janela ou estado inválido:
+        # amostragem bloqueante
+        return psutil.cpu_percent(interval=1)
+    
     def check_cpu_usage(self, threshold=80):
         """Verifica uso de CPU"""
-        cpu_percent = psutil.cpu_percent(interval=1)
-        cpu_count = psutil.cpu_count()
+        messages = CheckMessages(self.verbose)
+        cpu_percent = self._sample_cpu_percent()
+        cpu_count = self._cpu_count
         cpu_freq = psutil.cpu_freq()
         
         status = {
@@ -48,23 +195,29 @@ class SystemHealthChecker:
         
         if cpu_percent > threshold:
             status['status'] = 'CRITICAL'
-            self.alerts.append(f"🔴 CPU usage crítico: {cpu_percent}% (threshold: {threshold}%)")
+            messages.alert(f"🔴 CPU usage crítico: {cpu_percent}% (threshold: {threshold}%)")
         elif cpu_percent > threshold * 0.8:
             status['status'] = 'WARNING'
-            self.warnings.append(f"🟡 CPU usage alto: {cpu_percent}%")
+            messages.warning(f"🟡 CPU usage alto: {cpu_percent}%")
         else:
-            self.info.append(f"✅ CPU usage normal: {cpu_percent}%")
+            messages.add_info("✅ CPU usage normal: {}%", cpu_percent)
             
-        return status
+        return status, messages
     
     def check_memory_usage(self, threshold=85):
         """Verifica uso de memória"""
-        memory = psutil.virtual_memory()
-        swap = psutil.swap_memory()
+        messages = CheckMessages(self.verbose)
+        meminfo = _read_meminfo()
+        
+        total = meminfo['MemTotal']
+        available = meminfo.get('MemAvailable', meminfo['MemFree'])
+        swap_total = meminfo.get('SwapTotal', 0)
+        swap_used = swap_total - meminfo.get('SwapFree', 0)
         
-        memory_percent = memory.percent
-        memory_available = memory.available // (1024**3)  # GB
-        memory_total = memory.total // (1024**3)  # GB
+        memory_percent = round((total - available) / total * 100, 1)
+        swap_percent = round(swap_used / swap_total * 100, 1) if swap_total else 0.0
+        memory_available = available // (1024**3)  # GB
+        memory_total = total // (1024**3)  # GB
         
         status = {
             'metric': 'Memory Usage',
@@ -72,139 +225,199 @@ class SystemHealthChecker:
             'used': f"{memory_total - memory_available}GB",
             'total': f"{memory_total}GB",
             'available': f"{memory_available}GB",
-            'swap_used': f"{swap.percent}%",
+            'swap_used': f"{swap_percent}%",
             'status': 'OK'
         }
         
         if memory_percent > threshold:
             status['status'] = 'CRITICAL'
-            self.alerts.append(f"🔴 Memória crítica: {memory_percent}% (threshold: {threshold}%)")
+            messages.alert(f"🔴 Memória crítica: {memory_percent}% (threshold: {threshold}%)")
         elif memory_percent > threshold * 0.8:
             status['status'] = 'WARNING'
-            self.warnings.append(f"🟡 Memória alta: {memory_percent}%")
+            messages.warning(f"🟡 Memória alta: {memory_percent}%")
         else:
-            self.info.append(f"✅ Memória normal: {memory_percent}%")
+            messages.add_info("✅ Memória normal: {}%", memory_percent)
             
-        return status
+        return status, messages
     
     def check_disk_usage(self, threshold=90):
         """Verifica uso de disco"""
-        disk_status = []
+        messages = CheckMessages(self.verbose)
         
-        for partition in psutil.disk_partitions():
+        # Resultados em colunas (struct-of-arrays), com valores numéricos
+        # crus; formatação só na exibição
+        mountpoints = []
+        devices = []
+        fstypes = []
+        totals = array('q')
+        used_bytes = array('q')
+        free_bytes = array('q')
+        percents = array('d')
+        states = []
+        
+        for partition in _disk_partitions():
             try:
-                usage = psutil.disk_usage(partition.mountpoint)
-                percent = (usage.used / usage.total) * 100
+                stats = os.statvfs(partition.mountpoint)
+                total = stats.f_blocks * stats.f_frsize
+                used = (stats.f_blocks - stats.f_bfree) * stats.f_frsize
+                free = stats.f_bavail * stats.f_frsize
+                
+                if not total:
+                    continue
                 
-                status = {
-                    'mountpoint': partition.mountpoint,
-                    'device': partition.device,
-                    'fstype': partition.fstype,
-                    'total': f"{usage.total // (1024**3)}GB",
-                    'used': f"{usage.used // (1024**3)}GB",
-                    'free': f"{usage.free // (1024**3)}GB",
-                    'percent': f"{percent:.1f}%",
-                    'status': 'OK'
-                }
+                percent = (used / total) * 100
                 
                 if percent > threshold:
-                    status['status'] = 'CRITICAL'
-                    self.alerts.append(f"🔴 Disco crítico {partition.mountpoint}: {percent:.1f}%")
+                    state = 'CRITICAL'
+                    messages.alert(f"🔴 Disco crítico {partition.mountpoint}: {percent:.1f}%")
                 elif percent > threshold * 0.8:
-                    status['status'] = 'WARNING'
-                    self.warnings.append(f"🟡 Disco alto {partition.mountpoint}: {percent:.1f}%")
+                    state = 'WARNING'
+                    messages.warning(f"🟡 Disco alto {partition.mountpoint}: {percent:.1f}%")
                 else:
-                    self.info.append(f"✅ Disco normal {partition.mountpoint}: {percent:.1f}%")
-                    
-                disk_status.append(status)
+                    state = 'OK'
+                    messages.add_info("✅ Disco normal {}: {:.1f}%", partition.mountpoint, percent)
+                
+                mountpoints.append(partition.mountpoint)
+                devices.append(partition.device)
+                fstypes.append(partition.fstype)
+                totals.append(total)
+                used_bytes.append(used)
+                free_bytes.append(free)
+                percents.append(percent)
+                states.append(state)
                 
-            except PermissionError:
+            except OSError:
                 continue
                 
-        return disk_status
+        disk_status = {
+            'mount': mountpoints,
+            'device': devices,
+            'fstype': fstypes,
+            'total_bytes': totals.tolist(),
+            'used_bytes': used_bytes.tolist(),
+            'free_bytes': free_bytes.tolist(),
+            'percent': [round(percent, 1) for percent in percents],
+            'status': states
+        }
+        
+        return disk_status, messages
     
-    def check_services(self, services_list):
+    async def check_services(self, services_list):
         """Verifica status de serviços"""
-        service_status = []
+        messages = CheckMessages(self.verbose)
+        service_status = {
+            'service': [],
+            'state': [],
+            'active': []
+        }
         
-        for service in services_list:
-            try:
-                result = subprocess.run(
-                    ['systemctl', 'is-active', service],
-                    capture_output=True,
-                    text=True
-                )
-                
-                is_active = result.stdout.strip() == 'active'
-                
-                status = {
-                    'service': service,
-                    'status': 'RUNNING' if is_active else 'STOPPED',
-                    'active': is_active
-                }
-                
-                if not is_active:
-                    self.alerts.append(f"🔴 Serviço parado: {service}")
-                else:
-                    self.info.append(f"✅ Serviço rodando: {service}")
-                    
-                service_status.append(status)
+        if not services_list:
+            return service_status, messages
+        
+        try:
+            # Uma única chamada ao systemctl para todos os serviços;
+            # a saída tem um estado por linha, na mesma ordem das units
+            proc = await asyncio.create_subprocess_exec(
+                'systemctl', 'is-active', *services_list,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            stdout, _ = await proc.communicate()
+        except Exception as e:
+            logging.error(f"Erro ao verificar serviços {', '.join(services_list)}: {e}")
+            return service_status, messages
+        
+        states = stdout.decode().splitlines()
+        
+        for index, service in enumerate(services_list):
+            state = states[index].strip() if index < len(states) else 'unknown'
+            is_active = state == 'active'
+            
+            if not is_active:
+                messages.alert(f"🔴 Serviço parado: {service}")
+            else:
+                messages.add_info("✅ Serviço rodando: {}", service)
                 
-            except Exception as e:
-                logging.error(f"Erro ao verificar serviço {service}: {e}")
+            service_status['service'].append(service)
+            service_status['state'].append(state)
+            service_status['active'].append(is_active)
                 
-        return service_status
+        return service_status, messages
     
-    def check_network_connectivity(self, hosts):
+    async def _probe_host(self, host, port=443, timeout=2):
+        """Testa um host via ICMP (icmplib) ou, se indisponível, via conexão TCP"""
+        avg_time = None
+        
+        try:
+            if async_ping is not None:
+                try:
+                    # ICMP sem privilégios (socket UDP), sem fork do binário ping
+                    result = await async_ping(host, count=2, timeout=1, privileged=False)
+                    is_reachable = result.is_alive
+                    if is_reachable:
+                        avg_time = result.avg_rtt
+                except ICMPLibError:
+                    # ICMP não permitido neste host; usar TCP
+                    is_reachable = None
+            else:
+                is_reachable = None
+            
+            if is_reachable is None:
+                start = time.monotonic()
+                try:
+                    _, writer = await asyncio.wait_for(
+                        asyncio.open_connection(host, port), timeout
+                    )
+                    avg_time = (time.monotonic() - start) * 1000
+                    is_reachable = True
+                    writer.close()
+                    await writer.wait_closed()
+                except ConnectionRefusedError:
+                    # RST recebido: o host respondeu, só não há serviço na porta
+                    avg_time = (time.monotonic() - start) * 1000
+                    is_reachable = True
+                except (OSError, asyncio.TimeoutError):
+                    is_reachable = False
+            
+            return {
+                'host': host,
+                'reachable': is_reachable,
+                'avg_response_time': f"{avg_time:.3f}ms" if avg_time is not None else "N/A",
+                'status': 'OK' if is_reachable else 'FAILED'
+            }
+            
+        except Exception as e:
+            logging.error(f"Erro ao verificar conectividade com {host}: {e}")
+            return None
+    
+    async def check_network_connectivity(self, hosts):
         """Verifica conectividade de rede"""
+        messages = CheckMessages(self.verbose)
         network_status = []
         
-        for host in hosts:
-            try:
-                result = subprocess.run(
-                    ['ping', '-c', '3', '-W', '5', host],
-                    capture_output=True,
-                    text=True
-                )
-                
-                is_reachable = result.returncode == 0
-                
-                # Extrair tempo de resposta
-                if is_reachable:
-                    lines = result.stdout.split('\n')
-                    for line in lines:
-                        if 'avg' in line:
-                            avg_time = line.split('/')[-2]
-                            break
-                    else:
-                        avg_time = "N/A"
-                else:
-                    avg_time = "N/A"
-                
-                status = {
-                    'host': host,
-                    'reachable': is_reachable,
-                    'avg_response_time': f"{avg_time}ms" if avg_time != "N/A" else "N/A",
-                    'status': 'OK' if is_reachable else 'FAILED'
-                }
-                
-                if not is_reachable:
-                    self.alerts.append(f"🔴 Host inacessível: {host}")
-                else:
-                    self.info.append(f"✅ Host acessível: {host} ({avg_time}ms)")
-                    
-                network_status.append(status)
+        # Probes concorrentes no event loop: tempo total ≈ host mais lento
+        results = await asyncio.gather(*(self._probe_host(host) for host in hosts))
+        
+        for status in results:
+            if status is None:
+                continue
+            
+            if not status['reachable']:
+                messages.alert(f"🔴 Host inacessível: {status['host']}")
+            else:
+                messages.add_info("✅ Host acessível: {} ({})", status['host'], status['avg_response_time'])
                 
-            except Exception as e:
-                logging.error(f"Erro ao verificar conectividade com {host}: {e}")
+            network_status.append(status)
                 
-        return network_status
+        return network_status, messages
     
     def check_load_average(self):
         """Verifica load average do sistema"""
+        messages = CheckMessages(self.verbose)
+        
         try:
-            load_avg = psutil.getloadavg()
-            cpu_count = psutil.cpu_count()
+            load_avg = _read_loadavg()
+            cpu_count = self._cpu_count
             
             # Load average por core
             load_1m = load_avg[0] / cpu_count
@@ -223,27 +436,96 @@ class SystemHealthChecker:
             
             if load_1m > 1.5:
                 status['status'] = 'CRITICAL'
-                self.alerts.append(f"🔴 Load average crítico: {load_1m:.2f} por core")
+                messages.alert(f"🔴 Load average crítico: {load_1m:.2f} por core")
             elif load_1m > 1.0:
                 status['status'] = 'WARNING'
-                self.warnings.append(f"🟡 Load average alto: {load_1m:.2f} por core")
+                messages.warning(f"🟡 Load average alto: {load_1m:.2f} por core")
             else:
-                self.info.append(f"✅ Load average normal: {load_1m:.2f} por core")
+                messages.add_info("✅ Load average normal: {:.2f} por core", load_1m)
                 
-            return status
+            return status, messages
             
         except Exception as e:
             logging.error(f"Erro ao verificar load average: {e}")
-            return None
+            return None, messages
+    
+    def check_top_processes(self, limit=5):
+        """Lista os processos que mais consomem memória"""
+        processes = []
+        
+        for proc in psutil.process_iter(['pid', 'name']):
+            try:
+                # oneshot() lê /proc/<pid>/* uma vez para todos os atributos
+                with proc.oneshot():
+                    memory_info = proc.memory_info()
+                    cpu_times = proc.cpu_times()
+                    processes.append({
+                        'pid': proc.info['pid'],
+                        'name': proc.info['name'],
+                        'rss': memory_info.rss,
+                        'memory_percent': proc.memory_percent(),
+                        'cpu_time': cpu_times.user + cpu_times.system,
+                        'threads': proc.num_threads()
+                    })
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        
+        processes.sort(key=lambda p: p['rss'], reverse=True)
+        
+        return [
+            {
+                'pid': p['pid'],
+                'name': p['name'],
+                'memory': f"{p['rss'] // (1024**2)}MB",
+                'memory_percent': f"{p['memory_percent']:.1f}%",
+                'cpu_time': f"{p['cpu_time']:.1f}s",
+                'threads': p['threads']
+            }
+            for p in processes[:limit]
+        ]
+    
+    async def run_all(self, services_list, hosts, top_processes=False):
+        """Executa todas as verificações concorrentemente"""
+        # Verificações síncronas (psutil, /proc) rodam em threads;
+        # serviços e rede usam subprocessos/sockets assíncronos
+        checks = [
+            asyncio.to_thread(self.check_cpu_usage),
+            asyncio.to_thread(self.check_memory_usage),
+            asyncio.to_thread(self.check_disk_usage),
+            self.check_services(services_list),
+            self.check_network_connectivity(hosts),
+            asyncio.to_thread(self.check_load_average)
+        ]
+        # Varre todos os /proc/<pid>: só quando pedido
+        if top_processes:
+            checks.append(asyncio.to_thread(self.check_top_processes))
+        
+        results = await asyncio.gather(*checks)
+        process_status = results.pop() if top_processes else None
+        
+        # Mensagens juntadas sempre na mesma ordem das verificações;
+        # cada execução substitui as mensagens da anterior
+        self.alerts = []
+        self.warnings = []
+        self.info = []
+        statuses = []
+        for status, messages in results:
+            self.alerts.extend(messages.alerts)
+            self.warnings.extend(messages.warnings)
+            self.info.extend(messages.info)
+            statuses.append(status)
+        
+        return (*statuses, process_status)
     
     def generate_report(self, cpu_status, memory_status, disk_status, 
-                       service_status, network_status, load_status):
+                       service_status, network_status, load_status,
+                       process_status=None):
         """Gera relatório completo"""
         
         system_info = {
-            'hostname': platform.node(),
-            'os': f"{platform.system()} {platform.release()}",
-            'architecture': platform.architecture()[0],
+            'hostname': _HOSTNAME,
+            'os': _OS,
+            'architecture': _ARCH,
             'uptime': self.get_uptime(),
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
@@ -266,26 +548,69 @@ class SystemHealthChecker:
             }
         }
         
+        if process_status is not None:
+            report['top_processes'] = process_status
+        
         return report
     
     def get_uptime(self):
         """Obtém uptime do sistema"""
         try:
-            uptime_seconds = psutil.boot_time()
-            uptime_delta = datetime.now() - datetime.fromtimestamp(uptime_seconds)
+            uptime_seconds = int(time.time() - psutil.boot_time())
             
-            days = uptime_delta.days
-            hours, remainder = divmod(uptime_delta.seconds, 3600)
+            days, remainder = divmod(uptime_seconds, 86400)
+            hours, remainder = divmod(remainder, 3600)
             minutes, _ = divmod(remainder, 60)
             
             return f"{days}d {hours}h {minutes}m"
         except:
             return "N/A"
     
-    def send_email_alert(self, report, email_config):
+    def _connect_smtp(self, email_config):
+        """Abre a sessão SMTP autenticada"""
+        server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
+        try:
+            server.starttls()
+            server.login(email_config['username'], email_config['password'])
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        # Encerrada na saída do processo, se ainda estiver aberta
+        atexit.register(self._close_smtp)
+    
+    def _close_smtp(self):
+        """Encerra a sessão SMTP, se houver"""
+        if self._smtp is None:
+            return
+        atexit.unregister(self._close_smtp)
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._smtp = None
+    
+    def _send_message(self, msg, email_config):
+        """Envia o email reaproveitando a sessão SMTP aberta"""
+        if self._smtp is None:
+            self._connect_smtp(email_config)
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Servidor encerrou a sessão ociosa; reconectar uma vez
+            self._close_smtp()
+            self._connect_smtp(email_config)
+            self._smtp.send_message(msg)
+    
+    def send_email_alert(self, report, email_config, alerts_text=None, warnings_text=None):
         """Envia alerta por email se houver problemas críticos"""
         if not self.alerts:
             return
+        
+        if alerts_text is None:
+            alerts_text = '\n'.join(self.alerts)
+        if warnings_text is None:
+            warnings_text = '\n'.join(self.warnings)
             
         try:
             msg = MIMEMultipart()
@@ -302,10 +627,10 @@ OS: {report['system_info']['os']}
 Uptime: {report['system_info']['uptime']}
 
 ALERTAS CRÍTICOS:
-{chr(10).join(self.alerts)}
+{alerts_text}
 
 WARNINGS:
-{chr(10).join(self.warnings) if self.warnings else 'Nenhum'}
+{warnings_text or 'Nenhum'}
 
 RESUMO:
 - CPU: {report['cpu']['value']}
@@ -317,11 +642,7 @@ Verificar sistema imediatamente!
             
             msg.attach(MIMEText(body, 'plain'))
             
-            server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
-            server.starttls()
-            server.login(email_config['username'], email_config['password'])
-            server.send_message(msg)
-            server.quit()
+            self._send_message(msg, email_config)
             
             logging.info("Alerta enviado por email")
             
@@ -332,29 +653,37 @@ def main():
     parser = argparse.ArgumentParser(description='System Health Checker')
     parser.add_argument('--json', action='store_true', help='Output em formato JSON')
     parser.add_argument('--email', action='store_true', help='Enviar alertas por email')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Incluir mensagens informativas (itens OK) no relatório')
+    parser.add_argument('--top-processes', action='store_true',
+                       help='Listar os processos que mais consomem memória')
     parser.add_argument('--services', nargs='+', default=['nginx', 'mysql', 'redis'], 
                        help='Serviços para verificar')
     parser.add_argument('--hosts', nargs='+', default=['8.8.8.8', 'google.com'],
-                       help='Hosts para testar conectividade')
+                       help='Hosts para testar conectividade (ICMP; sem icmplib, '
+                            'conexão TCP na porta 443)')
     
     args = parser.parse_args()
     
-    checker = SystemHealthChecker()
+    checker = SystemHealthChecker(verbose=args.verbose)
     
-    # Executar verificações
-    cpu_status = checker.check_cpu_usage()
-    memory_status = checker.check_memory_usage()
-    disk_status = checker.check_disk_usage()
-    service_status = checker.check_services(args.services)
-    network_status = checker.check_network_connectivity(args.hosts)
-    load_status = checker.check_load_average()
+    # Executar verificações em paralelo (I/O e subprocessos dominam o tempo)
+    (cpu_status, memory_status, disk_status, service_status,
+     network_status, load_status, process_status) = asyncio.run(
+        checker.run_all(args.services, args.hosts, args.top_processes)
+    )
     
     # Gerar relatório
     report = checker.generate_report(
         cpu_status, memory_status, disk_status,
-        service_status, network_status, load_status
+        service_status, network_status, load_status,
+        process_status
     )
     
+    # Texto das mensagens, montado uma única vez para console e email
+    alerts_text = '\n'.join(checker.alerts)
+    warnings_text = '\n'.join(checker.warnings)
+    
     # Output
     if args.json:
         print(json.dumps(report, indent=2))
@@ -370,17 +699,21 @@ def main():
         
         if checker.alerts:
             print(f"\n🚨 ALERTAS CRÍTICOS ({len(checker.alerts)}):")
-            for alert in checker.alerts:
-                print(f"  {alert}")
+            print(textwrap.indent(alerts_text, '  '))
                 
         if checker.warnings:
             print(f"\n⚠️  WARNINGS ({len(checker.warnings)}):")
-            for warning in checker.warnings:
-                print(f"  {warning}")
+            print(textwrap.indent(warnings_text, '  '))
                 
-        print(f"\n✅ INFORMAÇÕES ({len(checker.info)}):")
-        for info in checker.info[:5]:  # Mostrar apenas as primeiras 5
-            print(f"  {info}")
+        if checker.info:
+            print(f"\n✅ INFORMAÇÕES ({len(checker.info)}):")
+            for info in checker.info[:5]:  # Mostrar apenas as primeiras 5
+                print(f"  {info}")
+        
+        if process_status:
+            print(f"\n📊 TOP PROCESSOS (memória):")
+            for proc in process_status:
+                print(f"  {proc['pid']:>7} {proc['name']:<20} {proc['memory']:>8} {proc['cpu_time']:>10}")
     
     # Enviar email se solicitado e houver alertas
     if args.email and checker.alerts:
@@ -392,7 +725,7 @@ def main():
             'username': 'alerts@company.com',
             'password': 'app_password'
         }
-        checker.send_email_alert(report, email_config)
+        checker.send_email_alert(report, email_config, alerts_text, warnings_text)
     
     # Exit code baseado no status
     if checker.alerts:
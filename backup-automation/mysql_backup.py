@@ -5,17 +5,47 @@ Automatiza backup de bancos MySQL para AWS S3 com rotação e notificações
 Author: Gabriel Monteiro
 """
 
+import atexit
+import io
 import os
 import sys
+import zlib
+from urllib.parse import urlencode
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 import logging
 import subprocess
 import smtplib
+import tempfile
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from pathlib import Path
 import configparser
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Upload multipart do stream comprimido, com partes enviadas em paralelo.
+# Como o stream não é seekable, o s3transfer mantém cada parte em memória:
+# pico ≈ max_in_memory_upload_chunks × multipart_chunksize = 4 × 16 MiB
+# = 64 MiB por banco (256 MiB com 4 bancos em paralelo). Limite do S3 de
+# 10.000 partes: até ~160 GB comprimidos por backup.
+S3_STREAM_CHUNK_SIZE = 16 * 1024 * 1024
+S3_STREAM_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_STREAM_CHUNK_SIZE,
+    multipart_chunksize=S3_STREAM_CHUNK_SIZE,
+    max_concurrency=4,
+    use_threads=True
+)
+# Não exposto no construtor do boto3; atributo herdado do s3transfer
+S3_STREAM_TRANSFER_CONFIG.max_in_memory_upload_chunks = 4
+
+# Pool de conexões HTTPS persistentes, dimensionado para os uploads paralelos
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'mode': 'adaptive', 'max_attempts': 5},
+    tcp_keepalive=True
+)
 
 # Configuração de logging
 logging.basicConfig(
@@ -27,15 +57,53 @@ logging.basicConfig(
     ]
 )
 
+@functools.lru_cache(maxsize=1)
+def _load_config(config_file):
+    """Lê e interpreta o arquivo de configuração uma única vez por processo"""
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return config
+
+class GzipStream(io.RawIOBase):
+    """Leitura comprimida em gzip de um stream, sob demanda e em processo"""
+    
+    def __init__(self, source, compresslevel=6, chunk_size=1024 * 1024):
+        self.source = source
+        self.chunk_size = chunk_size
+        # wbits=31: formato gzip (cabeçalho + CRC)
+        self._compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31)
+        self._buffer = bytearray()
+        self._eof = False
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, b):
+        # Preenche o buffer pedido por completo (exceto no fim do stream):
+        # o s3transfer decide entre PUT simples e multipart por uma leitura
+        # de multipart_threshold bytes
+        while len(self._buffer) < len(b) and not self._eof:
+            chunk = self.source.read(self.chunk_size)
+            if chunk:
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        del self._buffer[:size]
+        return size
+
 class MySQLBackupManager:
     def __init__(self, config_file='backup_config.ini'):
-        self.config = configparser.ConfigParser()
-        self.config.read(config_file)
+        self.config = _load_config(config_file)
         
         # MySQL Config
         self.mysql_host = self.config.get('mysql', 'host', fallback='localhost')
         self.mysql_user = self.config.get('mysql', 'user')
-        self.mysql_password = self.config.get('mysql', 'password')
+        # Segredos podem vir do ambiente em vez do arquivo
+        self.mysql_password = os.environ.get('MYSQL_PASSWORD') or self.config.get('mysql', 'password')
         self.databases = self.config.get('mysql', 'databases').split(',')
         
         # AWS Config
@@ -43,77 +111,60 @@ class MySQLBackupManager:
         self.aws_region = self.config.get('aws', 'region', fallback='us-east-1')
         
         # Backup Config
-        self.backup_dir = self.config.get('backup', 'local_dir', fallback='/tmp/mysql_backups')
         self.retention_days = int(self.config.get('backup', 'retention_days', fallback='30'))
         
         # Email Config
         self.smtp_server = self.config.get('email', 'smtp_server', fallback='smtp.gmail.com')
         self.smtp_port = int(self.config.get('email', 'smtp_port', fallback='587'))
         self.email_user = self.config.get('email', 'user')
-        self.email_password = self.config.get('email', 'password')
+        self.email_password = os.environ.get('EMAIL_PASSWORD') or self.config.get('email', 'password')
         self.notification_email = self.config.get('email', 'notification_email')
+        # Sessão SMTP reaproveitada entre envios (aberta sob demanda)
+        self._smtp = None
         
         # Inicializar S3 client
-        self.s3_client = boto3.client('s3', region_name=self.aws_region)
-        
-        # Criar diretório local se não existir
-        Path(self.backup_dir).mkdir(parents=True, exist_ok=True)
+        self.s3_client = boto3.client(
+            's3',
+            region_name=self.aws_region,
+            config=S3_CLIENT_CONFIG
+        )
 
-    def create_mysql_dump(self, database):
-        """Cria dump do banco MySQL"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        dump_file = f"{self.backup_dir}/{database}_{timestamp}.sql"
-        
+    def create_mysql_dump(self, database, stderr):
+        """Inicia o mysqldump do banco com a saída SQL em um pipe"""
         cmd = [
             'mysqldump',
             f'--host={self.mysql_host}',
             f'--user={self.mysql_user}',
             f'--password={self.mysql_password}',
             '--single-transaction',
+            '--quick',
             '--routines',
             '--triggers',
             database
         ]
         
-        try:
-            logging.info(f"Criando backup do banco {database}...")
-            with open(dump_file, 'w') as f:
-                result = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, text=True)
-                
-            if result.returncode != 0:
-                raise Exception(f"Erro no mysqldump: {result.stderr}")
-                
-            # Comprimir o arquivo
-            compressed_file = f"{dump_file}.gz"
-            subprocess.run(['gzip', dump_file], check=True)
-            
-            logging.info(f"Backup criado: {compressed_file}")
-            return compressed_file
-            
-        except Exception as e:
-            logging.error(f"Erro ao criar backup de {database}: {str(e)}")
-            raise
+        # Compressão no protocolo só compensa quando o servidor é remoto
+        if self.mysql_host not in ('localhost', '127.0.0.1', '::1'):
+            cmd.insert(-1, '--compress')
+        
+        logging.info(f"Criando backup do banco {database}...")
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
 
-    def upload_to_s3(self, local_file, database):
+    def upload_to_s3(self, fileobj, s3_key, database):
         """Upload do backup para S3"""
         try:
-            file_name = os.path.basename(local_file)
-            s3_key = f"mysql_backups/{database}/{file_name}"
+            logging.info(f"Uploading {os.path.basename(s3_key)} para S3...")
+            # Tags enviadas junto com o upload (sem PutObjectTagging extra)
+            tagging = urlencode({
+                'Type': 'mysql_backup',
+                'Database': database,
+                'Date': datetime.now().strftime('%Y-%m-%d')
+            })
             
-            logging.info(f"Uploading {file_name} para S3...")
-            self.s3_client.upload_file(local_file, self.s3_bucket, s3_key)
-            
-            # Adicionar tags para organização
-            self.s3_client.put_object_tagging(
-                Bucket=self.s3_bucket,
-                Key=s3_key,
-                Tagging={
-                    'TagSet': [
-                        {'Key': 'Type', 'Value': 'mysql_backup'},
-                        {'Key': 'Database', 'Value': database},
-                        {'Key': 'Date', 'Value': datetime.now().strftime('%Y-%m-%d')}
-                    ]
-                }
+            self.s3_client.upload_fileobj(
+                fileobj, self.s3_bucket, s3_key,
+                ExtraArgs={'Tagging': tagging},
+                Config=S3_STREAM_TRANSFER_CONFIG
             )
             
             logging.info(f"Upload concluído: s3://{self.s3_bucket}/{s3_key}")
@@ -123,29 +174,65 @@ class MySQLBackupManager:
             logging.error(f"Erro no upload para S3: {str(e)}")
             raise
 
+    def stream_backup_to_s3(self, database):
+        """Envia o mysqldump comprimido direto para o S3, sem arquivo local"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        s3_key = f"mysql_backups/{database}/{database}_{timestamp}.sql.gz"
+        
+        # stderr em arquivo temporário para não travar o pipe do mysqldump
+        with tempfile.TemporaryFile() as dump_errors:
+            dump_proc = self.create_mysql_dump(database, dump_errors)
+            
+            try:
+                self.upload_to_s3(GzipStream(dump_proc.stdout), s3_key, database)
+            finally:
+                dump_proc.stdout.close()
+                dump_returncode = dump_proc.wait()
+            
+            if dump_returncode != 0:
+                # Não manter no S3 um dump truncado
+                self.s3_client.delete_object(Bucket=self.s3_bucket, Key=s3_key)
+                dump_errors.seek(0)
+                errors = dump_errors.read().decode(errors='replace')
+                raise Exception(f"Erro no mysqldump: {errors}")
+        
+        logging.info(f"Backup criado: s3://{self.s3_bucket}/{s3_key}")
+        return s3_key
+
     def cleanup_old_backups(self, database):
         """Remove backups antigos do S3 baseado na retenção configurada"""
         try:
             cutoff_date = datetime.now() - timedelta(days=self.retention_days)
             prefix = f"mysql_backups/{database}/"
             
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.s3_bucket,
-                Prefix=prefix
-            )
+            # Paginação: list_objects_v2 retorna no máximo 1000 chaves por chamada
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            old_objects = [
+                {'Key': obj['Key']}
+                for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=prefix)
+                for obj in page.get('Contents', [])
+                if obj['LastModified'].replace(tzinfo=None) < cutoff_date
+            ]
             
-            if 'Contents' not in response:
-                return
-                
             deleted_count = 0
-            for obj in response['Contents']:
-                if obj['LastModified'].replace(tzinfo=None) < cutoff_date:
-                    self.s3_client.delete_object(
-                        Bucket=self.s3_bucket,
-                        Key=obj['Key']
-                    )
-                    logging.info(f"Backup antigo removido: {obj['Key']}")
-                    deleted_count += 1
+            # delete_objects aceita até 1000 chaves por requisição
+            for i in range(0, len(old_objects), 1000):
+                batch = old_objects[i:i + 1000]
+                response = self.s3_client.delete_objects(
+                    Bucket=self.s3_bucket,
+                    Delete={'Objects': batch, 'Quiet': True}
+                )
+                
+                errors = response.get('Errors', [])
+                for error in errors:
+                    logging.error(f"Erro ao remover {error['Key']}: {error.get('Message')}")
+                
+                failed_keys = {error['Key'] for error in errors}
+                for obj in batch:
+                    if obj['Key'] not in failed_keys:
+                        logging.info(f"Backup antigo removido: {obj['Key']}")
+                
+                deleted_count += len(batch) - len(failed_keys)
                     
             if deleted_count > 0:
                 logging.info(f"Limpeza concluída: {deleted_count} backups antigos removidos")
@@ -153,6 +240,42 @@ class MySQLBackupManager:
         except Exception as e:
             logging.error(f"Erro na limpeza de backups antigos: {str(e)}")
 
+    def _connect_smtp(self):
+        """Abre a sessão SMTP autenticada"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.email_user, self.email_password)
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        # Encerrada na saída do processo, se ainda estiver aberta
+        atexit.register(self._close_smtp)
+
+    def _close_smtp(self):
+        """Encerra a sessão SMTP, se houver"""
+        if self._smtp is None:
+            return
+        atexit.unregister(self._close_smtp)
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._smtp = None
+
+    def _send_message(self, msg):
+        """Envia o email reaproveitando a sessão SMTP aberta"""
+        if self._smtp is None:
+            self._connect_smtp()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Servidor encerrou a sessão ociosa; reconectar uma vez
+            self._close_smtp()
+            self._connect_smtp()
+            self._smtp.send_message(msg)
+
     def send_notification(self, subject, message, is_error=False):
         """Envia notificação por email"""
         try:
@@ -168,17 +291,28 @@ class MySQLBackupManager:
                 
             msg.attach(MIMEText(message, 'plain'))
             
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email_user, self.email_password)
-            server.send_message(msg)
-            server.quit()
+            self._send_message(msg)
             
             logging.info("Notificação enviada por email")
             
         except Exception as e:
             logging.error(f"Erro ao enviar notificação: {str(e)}")
 
+    def _backup_one(self, database):
+        """Executa dump, upload e limpeza de um banco"""
+        try:
+            # Dump comprimido direto para o S3
+            s3_key = self.stream_backup_to_s3(database)
+            
+            # Limpeza de backups antigos
+            self.cleanup_old_backups(database)
+            
+            return database, True, f"✅ {database}: {os.path.basename(s3_key)}"
+            
+        except Exception as e:
+            logging.error(f"Falha no backup de {database}: {str(e)}")
+            return database, False, f"❌ {database}: {str(e)}"
+
     def run_backup(self):
         """Executa o processo completo de backup"""
         start_time = datetime.now()
@@ -188,28 +322,18 @@ class MySQLBackupManager:
         
         logging.info("=== Iniciando processo de backup MySQL ===")
         
-        for database in self.databases:
-            database = database.strip()
-            try:
-                # Criar dump
-                dump_file = self.create_mysql_dump(database)
-                
-                # Upload para S3
-                s3_key = self.upload_to_s3(dump_file, database)
-                
-                # Limpeza de backups antigos
-                self.cleanup_old_backups(database)
-                
-                # Remover arquivo local
-                os.remove(dump_file)
-                
+        databases = [database.strip() for database in self.databases]
+        
+        # Bancos em paralelo, limitado para não sobrecarregar o servidor MySQL
+        with ThreadPoolExecutor(max_workers=max(1, min(4, len(databases)))) as executor:
+            results = list(executor.map(self._backup_one, databases))
+        
+        for database, success, detail in results:
+            if success:
                 success_count += 1
-                backup_details.append(f"✅ {database}: {os.path.basename(dump_file)}")
-                
-            except Exception as e:
+            else:
                 error_count += 1
-                backup_details.append(f"❌ {database}: {str(e)}")
-                logging.error(f"Falha no backup de {database}: {str(e)}")
+            backup_details.append(detail)
         
         # Relatório final
         end_time = datetime.now()
@@ -230,7 +354,6 @@ Detalhes:
 Configurações:
 - Bucket S3: {self.s3_bucket}
 - Retenção: {self.retention_days} dias
-- Diretório local: {self.backup_dir}
         """
         
         logging.info(report)
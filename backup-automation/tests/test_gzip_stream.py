@@ -0,0 +1,36 @@
+import gzip
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+pytest.importorskip('boto3')
+from mysql_backup import GzipStream  # noqa: E402
+
+
+def test_read_returns_requested_size_until_eof():
+    data = os.urandom(4 * 1024 * 1024)
+    stream = GzipStream(io.BytesIO(data), chunk_size=64 * 1024)
+    size = 1024 * 1024
+
+    chunks = []
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+
+    # Todas as leituras, menos a última, devem vir completas
+    assert all(len(chunk) == size for chunk in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= size
+    assert gzip.decompress(b''.join(chunks)) == data
+
+
+def test_output_is_valid_gzip():
+    data = b'INSERT INTO t VALUES (1);\n' * 100000
+    stream = GzipStream(io.BytesIO(data))
+
+    assert gzip.decompress(stream.read()) == data